@@ -1,15 +1,33 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import io
+import importlib.util
+import re
+import os
+import glob
+import pickle
+import json
+import time
+import threading
+import hashlib
+from zoneinfo import ZoneInfo
 import requests # 新增：用於建立偽裝請求
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from tenacity import retry, retry_if_exception, wait_exponential, stop_after_attempt
+from google.oauth2.service_account import Credentials
 import twstock
+from indicators import ma_bollinger, rolling_mean, macd, obv, partition_quantile, backtest_loop, warmup
+
+# plotly_chart 每次重跑都要把 Figure 轉成 JSON；有裝 orjson 就改用 C 實作的序列化
+if importlib.util.find_spec("orjson"): pio.json.config.default_engine = "orjson"
 
 # --- 1. 頁面設定 ---
 st.set_page_config(page_title="台股全方位指揮所", layout="wide", page_icon="🏯")
@@ -43,7 +61,40 @@ DEFAULT_STOCKS = {
 SYMBOL_TO_NAME = {v: k for k, v in DEFAULT_STOCKS.items()}
 
 # --- 3. 智能名稱辨識系統 ---
-@st.cache_data(ttl=86400)
+@st.cache_resource
+def get_yahoo_session():
+    # 建立一個偽裝的 Session，所有 Ticker 共用以保留連線與 cookie
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    })
+    return session
+
+@st.cache_resource(ttl=600)
+def get_ticker(symbol):
+    return yf.Ticker(symbol, session=get_yahoo_session())
+
+NAME_CACHE_DIR = os.path.join(".cache", "names")
+NAME_CACHE_TTL = 30 * 86400
+
+def _name_cache_path(symbol):
+    return os.path.join(NAME_CACHE_DIR, f"{symbol.replace('/', '_')}.json")
+
+def _read_cached_name(symbol):
+    # Yahoo 查到的名稱存在磁碟 30 天，重啟容器後不必再打 info
+    try:
+        with open(_name_cache_path(symbol), encoding='utf-8') as f: entry = json.load(f)
+        if time.time() - entry['ts'] < NAME_CACHE_TTL: return entry['name']
+    except Exception: pass
+    return None
+
+def _write_cached_name(symbol, name):
+    try:
+        os.makedirs(NAME_CACHE_DIR, exist_ok=True)
+        with open(_name_cache_path(symbol), 'w', encoding='utf-8') as f: json.dump({'name': name, 'ts': time.time()}, f, ensure_ascii=False)
+    except OSError: pass
+
+@st.cache_data(ttl=86400, show_spinner=False)
 def get_stock_display_name(symbol):
     symbol = symbol.upper().strip()
     if symbol in SYMBOL_TO_NAME: return SYMBOL_TO_NAME[symbol]
@@ -54,88 +105,155 @@ def get_stock_display_name(symbol):
                 stock_info = twstock.codes[pure_code]
                 return f"{stock_info.name} ({pure_code})"
         except: pass
+    cached = _read_cached_name(symbol)
+    if cached: return cached
     try:
+        # 名稱查詢沿用 yfinance 自己的 session；偽裝 Session 只給財報路徑用，新版 yfinance 不接受 requests.Session
         t = yf.Ticker(symbol)
-        name = t.info.get('shortName') or t.info.get('longName') or symbol
-        return f"{name} ({symbol.replace('.TW', '').replace('.TWO', '')})"
+        name = t.info.get('shortName') or t.info.get('longName')
+        display_name = f"{name or symbol} ({symbol.replace('.TW', '').replace('.TWO', '')})"
+        if name: _write_cached_name(symbol, display_name)
+        return display_name
     except: return symbol
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_display_names(symbols):
+    # 庫存各檔的 info 請求彼此獨立，同時發出；symbols 為排序後的 tuple
+    # 工作執行緒要掛上 ScriptRunContext，裡面呼叫的快取函式才不會找不到 session
+    with ThreadPoolExecutor(max_workers=8, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())) as ex:
+        return dict(zip(symbols, ex.map(get_stock_display_name, symbols)))
+
 # --- 4. Google Sheets 連線 ---
 SHEET_NAME = "我的持股庫存"
 
+@st.cache_resource(ttl=3500)
+def _authorize_gspread():
+    # 授權後的 client 跨重跑共用 (內含的 AuthorizedSession 已保持連線)，在一小時的 token 到期前換新；
+    # 失敗時拋出例外，不會被快取
+    # 讀寫試算表只需 Sheets 權限；Drive 只用來依名稱找檔與讀修改時間，唯讀即可
+    scope = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive.readonly']
+    creds_dict = dict(st.secrets["gcp_service_account"])
+    creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
+    return gspread.authorize(creds)
+
 def get_gspread_client():
-    try:
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        return client
+    try: return _authorize_gspread()
     except: return None
 
-def load_portfolio_gs():
+@st.cache_resource(ttl=3500)
+def _open_sheet():
+    # 開啟試算表要先經 Drive 依名稱搜尋再抓 metadata，工作表物件跨重跑共用；
+    # 讀寫失敗時清掉，下次重新開啟 (例如試算表被刪除重建)
+    return _authorize_gspread().open(SHEET_NAME).sheet1
+
+def _portfolio_revision(client):
+    # 只向 Drive 查一次修改時間，試算表有變動時快取鍵就會不同
+    try:
+        f = next(f for f in client.list_spreadsheet_files(title=SHEET_NAME) if f['name'] == SHEET_NAME)
+        return f"{f['id']}:{f.get('modifiedTime', '')}"
+    except: return ""
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_portfolio_rev(rev_hint):
     client = get_gspread_client()
     if not client: return pd.DataFrame()
     try:
-        sheet = client.open(SHEET_NAME).sheet1
-        data = sheet.get_all_records()
-        if not data: return pd.DataFrame({'代號': ['2330.TW'], '買入均價': [500.0], '持有股數': [1000]})
-        return pd.DataFrame(data)
-    except: return pd.DataFrame()
+        sheet = _open_sheet()
+        # 只讀 A:C 三欄原始值，不必像 get_all_records 逐格轉型
+        rows = sheet.get('A:C', value_render_option='UNFORMATTED_VALUE')
+        if len(rows) < 2: return pd.DataFrame({'代號': ['2330.TW'], '買入均價': [500.0], '持有股數': [1000]})
+        header, *data = rows
+        df = pd.DataFrame([r + [''] * (len(header) - len(r)) for r in data], columns=header)
+        if '買入均價' in df.columns: df['買入均價'] = pd.to_numeric(df['買入均價'], errors='coerce')
+        if '持有股數' in df.columns: df['持有股數'] = pd.to_numeric(df['持有股數'], errors='coerce')
+        return df
+    except:
+        _open_sheet.clear()
+        return pd.DataFrame()
+
+def load_portfolio_gs():
+    client = get_gspread_client()
+    if not client: return pd.DataFrame()
+    return _load_portfolio_rev(_portfolio_revision(client))
+
+def _to_cell(v):
+    if v is None or pd.isna(v): return {}
+    if isinstance(v, (bool, np.bool_)): return {'userEnteredValue': {'boolValue': bool(v)}}
+    if isinstance(v, (int, float, np.number)): return {'userEnteredValue': {'numberValue': float(v)}}
+    return {'userEnteredValue': {'stringValue': str(v)}}
+
+def _is_retryable_api_error(e):
+    # 429 (寫入配額) 與暫時性的 5xx 才值得重試，權限或格式錯誤直接回報
+    return isinstance(e, gspread.exceptions.APIError) and getattr(e.response, 'status_code', None) in (429, 500, 502, 503)
+
+@retry(retry=retry_if_exception(_is_retryable_api_error), wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5), reraise=True)
+def _batch_update_with_backoff(spreadsheet, body):
+    return spreadsheet.batch_update(body)
 
 def save_portfolio_gs(df):
     client = get_gspread_client()
     if not client: return
     try:
-        sheet = client.open(SHEET_NAME).sheet1
-        sheet.clear()
-        sheet.update([df.columns.values.tolist()] + df.values.tolist())
+        sheet = _open_sheet()
+        values = [df.columns.values.tolist()] + df.values.tolist()
+        # 清空舊資料與寫入新資料合併成同一個 batchUpdate 請求
+        # 只清 A:C (與讀取範圍相同)，使用者在 D 欄之後自行加的備註不會被抹掉
+        _batch_update_with_backoff(sheet.spreadsheet, {'requests': [
+            {'updateCells': {'range': {'sheetId': sheet.id, 'startColumnIndex': 0, 'endColumnIndex': 3}, 'fields': 'userEnteredValue'}},
+            {'updateCells': {'start': {'sheetId': sheet.id, 'rowIndex': 0, 'columnIndex': 0}, 'rows': [{'values': [_to_cell(v) for v in row]} for row in values], 'fields': 'userEnteredValue'}},
+        ]})
+        _load_portfolio_rev.clear()
+        # 不直接存 edited_df (可能含未填代號的空白列)，下次重跑改從試算表重讀
+        reset_portfolio_state()
         st.success("✅ 資料已同步寫入 Google Sheets！")
-    except Exception as e: st.error(f"寫入試算表失敗：{str(e)}")
+    except Exception as e:
+        _open_sheet.clear()
+        st.error(f"寫入試算表失敗：{str(e)}")
+
+def get_portfolio():
+    # 每個 session 只讀一次試算表，之後的重跑 (拉桿、切換選單) 直接用 session_state
+    if st.session_state.get('portfolio') is None:
+        df = load_portfolio_gs()
+        if df.empty: return df
+        st.session_state['portfolio'] = df
+    return st.session_state['portfolio']
+
+def reset_portfolio_state():
+    st.session_state.pop('portfolio', None)
 
 # --- 5. 回測引擎 ---
 def run_backtest(df, initial_capital=100000):
-    df = df.copy()
-    df['Signal'] = 0
-    df.loc[(df['MA5'] > df['MA20']) & (df['MA5'].shift(1) <= df['MA20'].shift(1)), 'Signal'] = 1
-    df.loc[(df['MA5'] < df['MA20']) & (df['MA5'].shift(1) >= df['MA20'].shift(1)), 'Signal'] = -1
-    cash = initial_capital
-    position = 0
-    trade_log = []
-    equity_curve = []
-    for i in range(len(df)):
-        price = df['Close'].iloc[i]
-        date = df.index[i]
-        signal = df['Signal'].iloc[i]
-        if signal == 1 and position == 0:
-            position = int(cash // price)
-            cash -= position * price
-            trade_log.append({'Date': date, 'Type': 'Buy', 'Price': price, 'Shares': position})
-        elif signal == -1 and position > 0:
-            cash += position * price
-            trade_log.append({'Date': date, 'Type': 'Sell', 'Price': price, 'Shares': position})
-            position = 0
-        current_equity = cash + (position * price)
-        equity_curve.append(current_equity)
-    df['Equity'] = equity_curve
-    total_return = (df['Equity'].iloc[-1] - initial_capital) / initial_capital * 100
-    trades_df = pd.DataFrame(trade_log)
-    return df, total_return, trades_df
+    # 直接讀取原始陣列，不複製整個 DataFrame；只回傳資產曲線 Series 與成交紀錄
+    close = df['Close'].to_numpy(dtype=np.float64)
+    # MA5 - MA20 的正負號一變就是交叉：變成 +1 為黃金交叉、變成 -1 為死亡交叉 (NaN 前後不算)
+    s = np.sign(df['MA5'].to_numpy(dtype=np.float64) - df['MA20'].to_numpy(dtype=np.float64))
+    cross = np.diff(s)
+    signal = np.zeros(len(df), dtype=np.int8)
+    signal[1:][(cross > 0) & (s[1:] == 1)] = 1
+    signal[1:][(cross < 0) & (s[1:] == -1)] = -1
+    # 逐根 K 棒的狀態更新交給編譯過的 backtest_loop，成交紀錄在外面再組回 DataFrame
+    equity, trade_idx, trade_type, trade_shares = backtest_loop(close, signal, float(initial_capital))
+    total_return = (equity[-1] - initial_capital) / initial_capital * 100
+    trade_log = pd.DataFrame({'Date': df.index[trade_idx], 'Type': np.where(trade_type == 1, 'Buy', 'Sell'), 'Price': close[trade_idx], 'Shares': trade_shares}) if trade_idx.size else pd.DataFrame()
+    return pd.Series(equity, index=df.index, name='Equity'), total_return, trade_log
 
 # --- 6. 側邊欄 ---
 with st.sidebar:
     st.header("🏯 指揮中心")
     search_input = st.text_input("🔍 輸入代號搜尋 (Enter 確認)", placeholder="例如 5478.TWO, 2330.TW")
     final_options = {}
+    portfolio_tickers = []
     try:
-        my_portfolio = load_portfolio_gs()
+        my_portfolio = get_portfolio()
         if not my_portfolio.empty and '代號' in my_portfolio.columns:
-            my_stocks = my_portfolio['代號'].astype(str).unique().tolist()
+            # yf.download 合併下載時會把代號轉大寫，試算表裡的代號先統一成同樣的寫法
+            my_stocks = list(dict.fromkeys(s.strip().upper() for s in my_portfolio['代號'].fillna('').astype(str) if s.strip()))
+            display_names = get_display_names(tuple(sorted(my_stocks)))
             for stock_symbol in my_stocks:
-                if stock_symbol and stock_symbol.strip():
-                    display_name = get_stock_display_name(stock_symbol)
-                    final_options[f"💰 [庫存] {display_name}"] = stock_symbol
+                final_options[f"💰 [庫存] {display_names[stock_symbol]}"] = stock_symbol
+                portfolio_tickers.append(stock_symbol)
     except: pass
-    existing_symbols = list(final_options.values())
+    existing_symbols = set(final_options.values())
     for name, symbol in DEFAULT_STOCKS.items():
         if symbol not in existing_symbols: final_options[name] = symbol
     if final_options:
@@ -147,52 +265,202 @@ with st.sidebar:
     days_to_show = st.slider("戰場範圍 (天)", 90, 360, 180)
     st.markdown("---")
     st.info("💡 提示：上市請加 .TW，上櫃請加 .TWO (例如 5478.TWO)，美股直接打代號。")
-    if st.button("🔄 刷新數據"): st.cache_data.clear()
+    b1, b2 = st.columns(2)
+    refresh_price = b1.button("🔄 刷新數據", on_click=reset_portfolio_state)
+    refresh_fund = b2.button("🧾 刷新財報", on_click=reset_portfolio_state)
+    if refresh_price or refresh_fund: st.cache_data.clear()
 
 # --- 7. 資料引擎 (技術面) ---
+@st.cache_resource
+def _start_kernel_warmup():
+    # Streamlit 要等第一個 session 執行腳本才會 import，編譯仍發生在第一位使用者的第一次執行；
+    # 每個行程只在背景執行緒做一次，讓編譯與下方下載資料的網路等待重疊 (load_data 若先用到會等編譯完成)
+    th = threading.Thread(target=warmup, args=(ma_bollinger, rolling_mean, macd, obv, backtest_loop), daemon=True)
+    th.start()
+    return th
+
+_start_kernel_warmup()
+
+# 固定抓兩年：回測使用完整區間，畫面最多顯示 360 天，指標暖機期也早已涵蓋在內
+HISTORY_DAYS = 730
+PRICE_COLS = ['Open', 'High', 'Low', 'Close', 'MA5', 'MA20', 'BB_Upper', 'BB_Lower', 'DIF', 'DEA', 'MACD_Hist']
+HISTORY_CACHE_DIR = ".cache"
+TW_TZ = ZoneInfo("Asia/Taipei")
+# 台股 09:00 開盤、13:30 收盤；收盤後多留一小時讓 Yahoo 日線定版
+TW_SESSION = ((9, 0), (14, 30))
+
+def _tw_now():
+    return datetime.now(TW_TZ)
+
+def _is_market_open_tw(now=None):
+    now = now or _tw_now()
+    return now.weekday() < 5 and TW_SESSION[0] <= (now.hour, now.minute) < TW_SESSION[1]
+
+def _last_trading_day(now=None):
+    # 最近一個已收盤的交易日 (只排除週末，國定假日時最後一根 K 棒對不上就照常重抓)
+    now = now or _tw_now()
+    day = now.date()
+    if now.weekday() >= 5 or (now.hour, now.minute) < TW_SESSION[1]: day -= timedelta(days=1)
+    while day.weekday() >= 5: day -= timedelta(days=1)
+    return day
+
+def _history_cache_path(symbols, date_str):
+    key = hashlib.md5(','.join(symbols).encode()).hexdigest()[:12]
+    return os.path.join(HISTORY_CACHE_DIR, f"hist_{key}_{date_str}.pkl")
+
+def clear_history_cache(keep_date=None):
+    # 刪除所有代號組合的歷史價格快取；給 keep_date 時保留該交易日的檔案，只清掉過期的
+    for path in glob.glob(os.path.join(HISTORY_CACHE_DIR, 'hist_*.pkl')):
+        if keep_date and path.endswith(f"_{keep_date}.pkl"): continue
+        try: os.remove(path)
+        except OSError: pass
+
+def _download_grouped(symbols, **kwargs):
+    # 多檔合併成一次請求，欄位統一為 (代號, 欄位) 兩層
+    symbols = list(symbols)
+    data = yf.download(symbols, group_by='ticker', progress=False, threads=True, **kwargs)
+    if not data.empty and not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([symbols[:1], data.columns])
+    return data
+
+HISTORY_TAIL_PERIOD = "5d"
+
+def _splice_recent(symbols, base, start):
+    """
+    以磁碟上的舊資料為底，只下載最近幾天接在後面；失敗或對不上時回傳 None 改為整段重抓
+    """
+    try:
+        recent = _download_grouped(symbols, period=HISTORY_TAIL_PERIOD)
+        overlap = recent.index.intersection(base.index)
+        if overlap.empty: return None
+        # 除權息後 Yahoo 會整段重算還原股價，重疊日的收盤對不上就代表舊資料已失效
+        old_close = base.loc[overlap].xs('Close', axis=1, level=1)
+        new_close = recent.loc[overlap].xs('Close', axis=1, level=1)[old_close.columns]
+        if not np.allclose(old_close.to_numpy(dtype=np.float64), new_close.to_numpy(dtype=np.float64), rtol=1e-6, equal_nan=True): return None
+        data = pd.concat([base.loc[base.index < recent.index[0]], recent[base.columns]])
+        return data.loc[data.index >= pd.Timestamp(start).normalize()]
+    except Exception: return None
+
 @st.cache_data(ttl=300)
-def load_data(symbol, days):
+def download_history(symbols):
+    """
+    選定標的與庫存共用同一次 Yahoo 請求 (symbols 為排序後的 tuple)
+    盤後若磁碟上已有最後一根 K 棒為最近交易日的資料，直接讀檔不連網；
+    盤中則以前一個交易日存下的資料為底，只補抓最近幾天
+    """
+    # 只對全為台股的組合啟用：美股在台灣晚上才開盤，台股收盤時間對它們沒有意義
+    tw_only = all(s.endswith(('.TW', '.TWO')) for s in symbols)
+    market_open = _is_market_open_tw()
+    trading_day = _last_trading_day()
+    trading_day_str = trading_day.strftime('%Y%m%d')
+    cache_path = _history_cache_path(symbols, trading_day_str)
+    base = None
+    if tw_only:
+        saved = sorted(glob.glob(_history_cache_path(symbols, '*')))
+        if saved:
+            try:
+                with open(saved[-1], 'rb') as f: base = pickle.load(f)
+            except Exception: base = None
+            if base is not None and saved[-1] == cache_path and not market_open: return base
     end_date = datetime.now()
-    fetch_start_date = end_date - timedelta(days=max(days + 150, 730))
+    fetch_start_date = end_date - timedelta(days=HISTORY_DAYS)
+    data = _splice_recent(symbols, base, fetch_start_date) if base is not None else None
+    if data is None:
+        try: data = _download_grouped(symbols, start=fetch_start_date, end=end_date)
+        except: return pd.DataFrame()
+    if tw_only and not market_open and not data.empty and data.index[-1].date() == trading_day:
+        try:
+            # 每搜尋一檔就會多一組代號組合，寫檔時順便清掉所有組合的過期檔，避免 .cache 無限成長
+            clear_history_cache(keep_date=trading_day_str)
+            os.makedirs(HISTORY_CACHE_DIR, exist_ok=True)
+            # 先寫暫存檔再置換，其他 session 同時讀取時不會讀到寫一半的檔案
+            with open(cache_path + '.tmp', 'wb') as f: pickle.dump(data, f)
+            os.replace(cache_path + '.tmp', cache_path)
+        except Exception: pass
+    return data
+
+# 盤後磁碟快取會一直沿用到下個交易日，「刷新數據」要連同檔案一起刪掉才會真的重抓
+if refresh_price: clear_history_cache()
+
+@st.cache_data(ttl=300)
+def load_data(symbol, universe=()):
+    symbol = symbol.strip().upper()
     try:
-        data = yf.download(symbol, start=fetch_start_date, end=end_date, progress=False)
+        bulk = download_history(tuple(sorted({symbol, *universe})))
+        if bulk.empty or symbol not in bulk.columns.get_level_values(0): return pd.DataFrame(), 0
+        # 不同市場的交易日不同，合併下載後需剔除該檔沒有交易的日期
+        data = bulk[symbol].dropna(how='all')
         if data.empty: return pd.DataFrame(), 0
-        if isinstance(data.columns, pd.MultiIndex): data.columns = data.columns.get_level_values(0)
-        data['MA5'] = data['Close'].rolling(window=5).mean()
-        data['MA20'] = data['Close'].rolling(window=20).mean()
-        data['STD20'] = data['Close'].rolling(window=20).std()
-        data['BB_Upper'] = data['MA20'] + (2 * data['STD20'])
-        data['BB_Lower'] = data['MA20'] - (2 * data['STD20'])
-        exp12 = data['Close'].ewm(span=12, adjust=False).mean()
-        exp26 = data['Close'].ewm(span=26, adjust=False).mean()
-        data['DIF'] = exp12 - exp26
-        data['DEA'] = data['DIF'].ewm(span=9, adjust=False).mean()
-        data['MACD_Hist'] = data['DIF'] - data['DEA']
-        data['OBV'] = (np.sign(data['Close'].diff()) * data['Volume']).fillna(0).cumsum()
-        data['OBV_MA'] = data['OBV'].rolling(window=20).mean()
-        data['Returns'] = data['Close'].pct_change()
-        var_95 = data['Returns'].quantile(0.05)
+        close = data['Close'].to_numpy(dtype=np.float64)
+        vol = data['Volume'].to_numpy(dtype=np.float64)
+        ma5, ma20, bb_u, bb_l = ma_bollinger(close, 5, 20, 2.0)
+        dif, dea, hist = macd(close, 12, 26, 9)
+        obv_line = obv(close, vol)
+        # 全部指標算完後一次 assign，避免逐欄插入造成 DataFrame 區塊碎片化
+        data = data.assign(MA5=ma5, MA20=ma20, BB_Upper=bb_u, BB_Lower=bb_l, DIF=dif, DEA=dea, MACD_Hist=hist, OBV=obv_line, OBV_MA=rolling_mean(obv_line, 20))
+        var_95 = partition_quantile(close[1:] / close[:-1] - 1.0, 0.05)
+        # 指標以 float64 算完後，價格類欄位改存 float32、成交量縮成最小可容納的整數型別：
+        # 快取每次重跑都要反序列化複製一份，資料量減半；OBV 數值大，維持 float64
+        data = data.astype(dict.fromkeys(PRICE_COLS, np.float32))
+        data['Volume'] = pd.to_numeric(data['Volume'], downcast='integer')
         return data, var_95
     except: return pd.DataFrame(), 0
 
+@st.cache_data(ttl=300, show_spinner=False)
+def load_backtest(symbol, universe=()):
+    # 分頁內容每次重跑都會執行，回測結果與 load_data 同樣依參數快取
+    full_df, _ = load_data(symbol, universe)
+    return run_backtest(full_df)
+
 # --- 8. 資料引擎 (基本面 - 隱形戰機版) ---
-@st.cache_data(ttl=3600)
+FUND_CACHE_DIR = ".cache"
+
+def _fund_cache_path(symbol, date_str=None):
+    # 財報以 (代號, 日期) 存成磁碟快取，重啟容器後仍可直接讀取
+    date_str = date_str or datetime.now().strftime('%Y%m%d')
+    return os.path.join(FUND_CACHE_DIR, f"fund_{symbol.replace('/', '_')}_{date_str}.pkl")
+
+def clear_fund_cache(symbol):
+    for path in glob.glob(_fund_cache_path(symbol, '*')):
+        try: os.remove(path)
+        except OSError: pass
+
+FUND_INFO_MODULES = ['financialData', 'summaryDetail']
+# 台股 ETF 代號皆為 00 開頭 (含 00631L、00679B 這類字尾)，Yahoo 不會有它們的財報
+TW_ETF_PATTERN = re.compile(r'^00\d{2,4}[A-Z]?(\.TWO?)?$')
+
+def fetch_info_subset(ticker, modules):
+    # 只向 quoteSummary 要需要的模組 (完整 info 會多抓 assetProfile 與另一支 quote API)
+    # yfinance 沒有公開這個參數，內部結構改版時退回完整 info
+    try:
+        result = ticker._quote._fetch(modules=modules)['quoteSummary']['result'][0]
+        info = {}
+        for mod in modules:
+            for k, v in (result.get(mod) or {}).items():
+                info[k] = v.get('raw') if isinstance(v, dict) else v
+        if info: return info
+    except Exception: pass
+    return ticker.info
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def load_fundamentals_robust(symbol):
     """
     使用偽裝 Session 來繞過 Yahoo 的反爬蟲機制
     """
+    if TW_ETF_PATTERN.match(symbol): return {}
+    cache_path = _fund_cache_path(symbol)
+    try:
+        with open(cache_path, 'rb') as f: return pickle.load(f)
+    except Exception: pass
     try:
-        # 建立一個偽裝的 Session
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
-
-        # 傳入 session 給 Ticker
-        ticker = yf.Ticker(symbol, session=session)
+        # 共用已建立好偽裝 Session 的 Ticker
+        ticker = get_ticker(symbol)
         
-        # 1. 嘗試獲取 info
-        info = ticker.info
+        # 1. info 與 balance sheet 是兩個獨立請求，同時發出以節省等待時間
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_info = ex.submit(fetch_info_subset, ticker, FUND_INFO_MODULES)
+            f_bs = ex.submit(lambda: ticker.balance_sheet)
+            info = f_info.result()
         
         # 2. 如果 info 是空的或抓不到 key，代表可能還是被擋，嘗試用 fast_info (備案)
         if not info or len(info) < 5:
@@ -208,79 +476,180 @@ def load_fundamentals_robust(symbol):
 
         # 備案：如果 info 缺東缺西，嘗試從 balance sheet 補
         if total_assets is None or total_equity is None:
-             bs = ticker.balance_sheet
-             if not bs.empty:
-                 for key in ['Total Assets', 'Assets', 'TotalAssets']:
-                     if key in bs.index: total_assets = bs.loc[key].iloc[0]; break
-                 for key in ['Stockholders Equity', 'Total Stockholder Equity', 'TotalStockholderEquity']:
-                     if key in bs.index: total_equity = bs.loc[key].iloc[0]; break
+             bs = f_bs.result()
+             # 只取最新一期轉成 dict，之後都是 O(1) 查找
+             bs_latest = bs.iloc[:, 0].to_dict() if not bs.empty else {}
+             total_assets = next((bs_latest[k] for k in ['Total Assets', 'Assets', 'TotalAssets'] if k in bs_latest), total_assets)
+             total_equity = next((bs_latest[k] for k in ['Stockholders Equity', 'Total Stockholder Equity', 'TotalStockholderEquity'] if k in bs_latest), total_equity)
         
         asset_turnover_val = total_revenue / total_assets if (total_revenue and total_assets) else None
         equity_multiplier_val = total_assets / total_equity if (total_assets and total_equity) else None
         
-        return {'PE': pe, 'ROE': roe, 'NetMargin': net_margin_val, 'AssetTurnover': asset_turnover_val, 'EquityMultiplier': equity_multiplier_val}
+        result = {'PE': pe, 'ROE': roe, 'NetMargin': net_margin_val, 'AssetTurnover': asset_turnover_val, 'EquityMultiplier': equity_multiplier_val}
+        # 被擋或欄位全缺時不寫磁碟快取，否則空結果會被沿用一整天
+        if all(v is None for v in result.values()): return result
+        try:
+            clear_fund_cache(symbol)
+            os.makedirs(FUND_CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f: pickle.dump(result, f)
+        except OSError: pass
+        return result
     except Exception as e:
         print(f"Debug Info: {e}")
         return {}
 
+if refresh_fund: clear_fund_cache(ticker_symbol)
+
+FIB_LEVELS = np.array([0.236, 0.618, 0.786])
+FIB_ZONES = [
+    ("🟢 價格處於低檔底部區。", "分批佈局，尋找長線買點。"),
+    ("⚖️ 價格處於中間震盪區域。", "依照均線趨勢順勢操作。"),
+    ("⚠️ 價格突破 61.8%，處於相對高檔。", "多單續抱，但需提高警覺。"),
+    ("🚨 價格進入 78.6%~88.6% 主力誘多獵殺區。", "嚴禁追高，隨時準備反轉做空或獲利了結。"),
+]
+
 def generate_signals(df, high, low):
-    last_close = df['Close'].iloc[-1]
-    last_vol = df['Volume'].iloc[-1]
+    # 各欄先取出 NumPy 陣列一次，之後都用陣列索引，不再逐次走 pandas 的 iloc
+    open_ = df['Open'].to_numpy()
+    close = df['Close'].to_numpy()
+    low_ = df['Low'].to_numpy()
+    vol = df['Volume'].to_numpy()
+    last_close = close[-1]
+    last_vol = vol[-1]
     wash_sale_msg = ""
     wash_detected = False
-    recent_df = df.iloc[-20:-1] 
-    avg_vol_20 = df['Volume'].rolling(window=20).mean().iloc[-1]
-    bullish_candles = recent_df[(recent_df['Close'] > recent_df['Open'] * 1.03) & (recent_df['Volume'] > avg_vol_20 * 1.5)]
-    if not bullish_candles.empty:
-        key_candle = bullish_candles.iloc[-1]
-        key_low = key_candle['Low']
-        key_vol = key_candle['Volume']
-        key_date = key_candle.name.strftime('%Y-%m-%d')
+    avg_vol_20 = vol[-20:].mean() if vol.size >= 20 else np.nan
+    # 近 19 根 K 棒直接在 NumPy 陣列上篩選，只有命中時才取日期
+    recent_vol = vol[-20:-1]
+    hits = np.flatnonzero((close[-20:-1] > open_[-20:-1] * 1.03) & (recent_vol > avg_vol_20 * 1.5))
+    if hits.size:
+        k = hits[-1]
+        key_low = low_[-20:-1][k]
+        key_vol = recent_vol[k]
+        key_date = df.index[-20:-1][k].strftime('%Y-%m-%d')
         if last_close >= key_low and last_vol < key_vol * 0.6:
             wash_detected = True
             wash_sale_msg = f"""<div class="wash-sale-alert">🌊 偵測到「主力洗盤」訊號！<br>1. 發動日：{key_date} (低點 {key_low:.1f})<br>2. 狀態：量縮守支撐</div>"""
-    diff = high - low
-    fib_levels = [low + diff*0.786, low + diff*0.618, low + diff*0.236]
-    pos_view, pos_action = "", ""
-    if last_close >= fib_levels[0]: pos_view, pos_action = "🚨 價格進入 78.6%~88.6% 主力誘多獵殺區。", "嚴禁追高，隨時準備反轉做空或獲利了結。"
-    elif last_close > fib_levels[1]: pos_view, pos_action = "⚠️ 價格突破 61.8%，處於相對高檔。", "多單續抱，但需提高警覺。"
-    elif last_close < fib_levels[2]: pos_view, pos_action = "🟢 價格處於低檔底部區。", "分批佈局，尋找長線買點。"
-    else: pos_view, pos_action = "⚖️ 價格處於中間震盪區域。", "依照均線趨勢順勢操作。"
-    bb_upper = df['BB_Upper'].iloc[-1]
+    # 收盤落在哪個費波那契區間，直接以 searchsorted 取區間編號查表
+    pos_view, pos_action = FIB_ZONES[int(np.searchsorted(low + (high - low) * FIB_LEVELS, last_close, side='right'))]
+    bb_upper = df['BB_Upper'].to_numpy()[-1]
     bb_view = "🔥 股價衝破布林上軌，極短線過熱。" if last_close > bb_upper else "🌊 股價在布林通道內運行。"
     bb_action = "不宜追價，考慮調節。" if last_close > bb_upper else "觀望或區間操作。"
-    last_obv = df['OBV'].iloc[-1]
-    last_obv_ma = df['OBV_MA'].iloc[-1]
+    last_obv = df['OBV'].to_numpy()[-1]
+    last_obv_ma = df['OBV_MA'].to_numpy()[-1]
     obv_view = "📈 OBV 位於均線之上，籌碼流入。" if last_obv > last_obv_ma else "📉 OBV 位於均線之下，籌碼流出。"
     obv_action = "主力心態偏多。" if last_obv > last_obv_ma else "主力心態保守。"
-    hist = df['MACD_Hist'].iloc[-1]
-    prev_hist = df['MACD_Hist'].iloc[-2]
+    hist, prev_hist = df['MACD_Hist'].to_numpy()[[-1, -2]]
     macd_view = "🚀 紅柱持續放大，動能強勁。" if hist > 0 and hist > prev_hist else ("⚠️ 紅柱縮短，背離警戒。" if hist > 0 and hist < prev_hist else "✨ 多空膠著或空方控盤。")
     macd_action = "積極操作。" if hist > 0 and hist > prev_hist else ("設好停利。" if hist > 0 and hist < prev_hist else "保守應對。")
     return {"wash_detected": wash_detected, "wash_sale_msg": wash_sale_msg, "position": (pos_view, pos_action), "bollinger": (bb_view, bb_action), "obv": (obv_view, obv_action), "macd": (macd_view, macd_action)}
 
-def get_live_prices(ticker_list):
+def _last_closes(data):
+    if data.empty: return {}
+    return data.xs('Close', axis=1, level=1).ffill().iloc[-1].dropna().to_dict()
+
+LIVE_PRICE_BATCH = 20
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_last_closes(batch):
+    # 抓 2 天讓假日或盤前空白的當日仍能取到前一個收盤；batch 為 tuple
+    try: return _last_closes(_download_grouped(batch, period="2d"))
+    except: return {}
+
+def get_live_prices(ticker_list, bulk=None):
+    # 優先沿用主畫面已下載的批次資料，只有不在其中的代號才另外請求
     prices = {}
+    # 表格中未填的代號可能是 None/NaN，不能與字串一起排序；回傳的鍵統一為去空白的大寫代號
+    ticker_list = [t.strip().upper() for t in ticker_list if isinstance(t, str) and t.strip()]
     if not ticker_list: return prices
-    try:
-        data = yf.download(ticker_list, period="1d", progress=False)['Close']
-        if len(ticker_list) == 1: prices[ticker_list[0]] = data.iloc[-1]
-        else:
-            for t in ticker_list:
-                try: prices[t] = data[t].iloc[-1]
-                except: prices[t] = 0
-    except: pass
+    if bulk is not None:
+        closes = _last_closes(bulk)
+        prices = {t: closes[t] for t in ticker_list if t in closes}
+    missing = sorted(t for t in ticker_list if t not in prices)
+    # 每次最多 20 檔一批，各批同時送出
+    batches = [tuple(missing[i:i + LIVE_PRICE_BATCH]) for i in range(0, len(missing), LIVE_PRICE_BATCH)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            for closes in ex.map(_fetch_last_closes, batches): prices.update(closes)
     return prices
 
+WEEKLY_CANDLE_ROWS = 250
+
+# Figure 物件直接快取 (不經序列化)，plotly_chart 收到 Figure 時只需轉成 JSON，省去重建與驗證
+# 以 (最後一根日期, 筆數, 最新收盤) 代表資料版本，避免每次重跑都雜湊整個 DataFrame
+@st.cache_resource(ttl=300, max_entries=32, hash_funcs={pd.DataFrame: lambda d: (d.index[-1], len(d), float(d['Close'].iloc[-1]))})
+def build_tech_chart(symbol, df):
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3])
+    # K 棒沒有 WebGL 版本，區間過長時改畫週 K，減少送到瀏覽器的圖形數量
+    # 以該週最後一個實際交易日為 K 棒位置，當週未結束時才不會畫到最後一根日 K 之後、拉長共用的 x 軸
+    candles = df[['Open', 'High', 'Low', 'Close']].assign(Date=df.index).resample('W-FRI').agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Date': 'max'}).dropna().set_index('Date') if len(df) > WEEKLY_CANDLE_ROWS else df
+    colors = np.where(df['MACD_Hist'].to_numpy() >= 0, '#ef4444', '#22c55e')
+    # 三條 trace 一次加入，圖表資料只驗證、複製一次
+    fig.add_traces([
+        go.Candlestick(x=candles.index, open=candles['Open'], high=candles['High'], low=candles['Low'], close=candles['Close'], name='K線', increasing_line_color='#ef4444', decreasing_line_color='#22c55e'),
+        go.Scattergl(x=df.index, y=df['MA20'], line=dict(color='orange'), name='MA20'),
+        go.Bar(x=df.index, y=df['MACD_Hist'], marker_color=colors, name='MACD'),
+    ], rows=[1, 1, 2], cols=[1, 1, 1])
+    # uirevision 固定為代號：重跑時保留使用者的縮放/平移，換股票才重置
+    fig.update_layout(height=600, showlegend=False, margin=dict(l=20, r=20, t=10, b=10), uirevision=symbol)
+    return fig
+
+@st.fragment
+def render_portfolio(universe):
+    # 庫存分頁包成 fragment：編輯表格或按「僅計算損益」時只重跑這一塊，不重算圖表與其他分頁
+    # (儲存後的 st.rerun() 仍是整頁重跑，讓側邊欄選單同步更新)
+    st.subheader("💰 雲端庫存管理 (Google Sheets 同步)")
+    portfolio_df = get_portfolio()
+    if not portfolio_df.empty:
+        edited_df = st.data_editor(portfolio_df, num_rows="dynamic", column_config={"代號": st.column_config.TextColumn(help="請輸入完整代號"),"買入均價": st.column_config.NumberColumn(format="$%.2f"),"持有股數": st.column_config.NumberColumn(format="%d")}, use_container_width=True, key="gs_editor")
+        c1, c2 = st.columns([1, 1])
+        with c1: save_btn = st.button("💾 儲存回 Google Sheets", type="primary")
+        with c2: calc_btn = st.button("🚀 僅計算損益")
+        if save_btn:
+            save_portfolio_gs(edited_df)
+            st.rerun()
+        if save_btn or calc_btn:
+            res_df = edited_df.copy()
+            # 表格新增的空白列代號是 None/NaN，先補成空字串；查價與名稱都用去空白的大寫代號當鍵
+            codes = res_df['代號'].fillna('').astype(str).str.strip().str.upper()
+            symbols = sorted({c for c in codes.unique() if c})
+            live_prices = get_live_prices(symbols, download_history(universe))
+            res_df['名稱'] = codes.map(get_display_names(tuple(symbols)))
+            # 損益一次在 NumPy 陣列上算完再整批寫回，避免逐欄產生中間 Series
+            p = codes.map(live_prices).fillna(0).to_numpy(dtype='float64')
+            s = res_df['持有股數'].to_numpy(dtype='float64', na_value=np.nan)
+            c = res_df['買入均價'].to_numpy(dtype='float64', na_value=np.nan)
+            mv = p * s
+            co = c * s
+            pl = mv - co
+            with np.errstate(divide='ignore', invalid='ignore'): ret = np.where(co > 0, pl / co * 100.0, 0.0)
+            ret[np.isnan(ret)] = 0.0
+            res_df[['現價', '市值', '成本', '損益', '報酬率%']] = np.column_stack([p, mv, co, pl, ret])
+            total_val = np.nansum(mv)
+            total_pl = np.nansum(pl)
+            st.divider()
+            st.metric("總資產市值", f"${total_val:,.0f}", f"{total_pl:+,.0f}")
+            def color_pl(col):
+                v = col.to_numpy()
+                return np.where(v > 0, 'color: #d32f2f; font-weight: bold', np.where(v < 0, 'color: #2e7d32; font-weight: bold', 'color: black; font-weight: bold'))
+            st.dataframe(res_df.style.apply(color_pl, subset=['損益', '報酬率%']).format({'現價':"{:.2f}", '市值':"{:,.0f}", '損益':"{:+,.0f}", '報酬率%':"{:+.2f}%"}), use_container_width=True)
+    else: st.warning("無法讀取 Google Sheet，請檢查 Secrets 設定。")
+
 # --- 主畫面 ---
 try:
-    full_df, var_95 = load_data(ticker_symbol, days_to_show)
+    universe = tuple(sorted({ticker_symbol, *portfolio_tickers}))
+    # 財報請求與價格下載互不相干，先交給背景執行緒，分頁 3 要用時才取結果
+    # 背景執行緒掛上本次執行的 ScriptRunContext，快取函式在裡面執行時才找得到 session
+    fund_pool = ThreadPoolExecutor(max_workers=1, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx()))
+    fund_future = fund_pool.submit(load_fundamentals_robust, ticker_symbol)
+    fund_pool.shutdown(wait=False)
+    full_df, var_95 = load_data(ticker_symbol, universe)
     if full_df.empty:
         st.error(f"❌ 無法取得數據：{ticker_symbol}。請確認代號是否正確。")
     else:
         df = full_df.tail(days_to_show)
         last_close = df['Close'].iloc[-1]
-        pct_change = df['Returns'].iloc[-1] * 100
+        pct_change = (df['Close'].iloc[-1] / df['Close'].iloc[-2] - 1) * 100
         high_price = df['High'].max()
         low_price = df['Low'].min()
         signals = generate_signals(df, high_price, low_price)
@@ -299,13 +668,7 @@ try:
             c2.metric("風險值 (VaR)", f"{var_95*100:.1f}%")
             c3.metric("高點", f"{high_price:.1f}")
             c4.metric("低點", f"{low_price:.1f}")
-            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3])
-            fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], name='K線', increasing_line_color='#ef4444', decreasing_line_color='#22c55e'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df.index, y=df['MA20'], line=dict(color='orange'), name='MA20'), row=1, col=1)
-            colors = ['#ef4444' if v >= 0 else '#22c55e' for v in df['MACD_Hist']]
-            fig.add_trace(go.Bar(x=df.index, y=df['MACD_Hist'], marker_color=colors, name='MACD'), row=2, col=1)
-            fig.update_layout(height=600, showlegend=False, margin=dict(l=20, r=20, t=10, b=10))
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_tech_chart(ticker_symbol, df), use_container_width=True)
 
         with tab2:
             st.subheader("🤖 AI 首席分析師綜合診斷報告")
@@ -321,7 +684,7 @@ try:
 
         with tab3:
             with st.spinner('分析財報數據中...'):
-                fund_data = load_fundamentals_robust(ticker_symbol)
+                fund_data = fund_future.result()
                 if not fund_data: st.warning("⚠️ 此標的無詳細財報數據 (可能是 ETF 或 資料源暫時無法存取)")
                 else:
                     m1, m2 = st.columns(2)
@@ -335,39 +698,12 @@ try:
                     d3.metric("總資產週轉率", f"{fund_data.get('AssetTurnover', 0):.2f} 次" if fund_data.get('AssetTurnover') else "N/A")
                     d4.metric("權益乘數", f"{fund_data.get('EquityMultiplier', 0):.2f} 倍" if fund_data.get('EquityMultiplier') else "N/A")
 
-        with tab4:
-            st.subheader("💰 雲端庫存管理 (Google Sheets 同步)")
-            portfolio_df = load_portfolio_gs()
-            if not portfolio_df.empty:
-                edited_df = st.data_editor(portfolio_df, num_rows="dynamic", column_config={"代號": st.column_config.TextColumn(help="請輸入完整代號"),"買入均價": st.column_config.NumberColumn(format="$%.2f"),"持有股數": st.column_config.NumberColumn(format="%d")}, use_container_width=True, key="gs_editor")
-                c1, c2 = st.columns([1, 1])
-                with c1: save_btn = st.button("💾 儲存回 Google Sheets", type="primary")
-                with c2: calc_btn = st.button("🚀 僅計算損益")
-                if save_btn:
-                    save_portfolio_gs(edited_df)
-                    st.rerun()
-                if save_btn or calc_btn:
-                    tickers = edited_df['代號'].astype(str).unique().tolist()
-                    live_prices = get_live_prices(tickers)
-                    res_df = edited_df.copy()
-                    res_df['名稱'] = res_df['代號'].apply(lambda x: get_stock_display_name(str(x)))
-                    res_df['現價'] = res_df['代號'].map(live_prices).fillna(0)
-                    res_df['市值'] = res_df['現價'] * res_df['持有股數']
-                    res_df['成本'] = res_df['買入均價'] * res_df['持有股數']
-                    res_df['損益'] = res_df['市值'] - res_df['成本']
-                    res_df['報酬率%'] = ((res_df['損益'] / res_df['成本']) * 100).fillna(0)
-                    total_val = res_df['市值'].sum()
-                    total_pl = res_df['損益'].sum()
-                    st.divider()
-                    st.metric("總資產市值", f"${total_val:,.0f}", f"{total_pl:+,.0f}")
-                    def color_pl(val): return f'color: {"#d32f2f" if val > 0 else "#2e7d32" if val < 0 else "black"}; font-weight: bold'
-                    st.dataframe(res_df.style.map(color_pl, subset=['損益', '報酬率%']).format({'現價':"{:.2f}", '市值':"{:,.0f}", '損益':"{:+,.0f}", '報酬率%':"{:+.2f}%"}), use_container_width=True)
-            else: st.warning("無法讀取 Google Sheet，請檢查 Secrets 設定。")
-            
+        with tab4: render_portfolio(universe)
+
         with tab5:
             st.subheader("🧪 策略回測實驗室")
             st.caption("策略邏輯：當 MA5 向上突破 MA20 時買進 (黃金交叉)，向下跌破 MA20 時賣出 (死亡交叉)。初始資金 10 萬元。")
-            bt_df, bt_return, trade_log = run_backtest(full_df)
+            bt_equity, bt_return, trade_log = load_backtest(ticker_symbol, universe)
             b1, b2, b3 = st.columns(3)
             b1.metric("回測期間總報酬率", f"{bt_return:.2f}%", delta_color="normal")
             b2.metric("總交易次數", f"{len(trade_log)} 次")
@@ -375,8 +711,8 @@ try:
             else: b3.error("❌ 策略驗證：此策略在此期間虧損。")
             st.divider()
             fig_bt = go.Figure()
-            fig_bt.add_trace(go.Scatter(x=bt_df.index, y=bt_df['Equity'], mode='lines', name='總資產變化', line=dict(color='#1a237e', width=2)))
-            fig_bt.update_layout(title="資產成長曲線 (Equity Curve)", height=400, margin=dict(l=20, r=20, t=40, b=20))
+            fig_bt.add_trace(go.Scattergl(x=bt_equity.index, y=bt_equity, mode='lines', name='總資產變化', line=dict(color='#1a237e', width=2)))
+            fig_bt.update_layout(title="資產成長曲線 (Equity Curve)", height=400, margin=dict(l=20, r=20, t=40, b=20), uirevision=ticker_symbol)
             st.plotly_chart(fig_bt, use_container_width=True)
             if not trade_log.empty:
                 st.write("📜 交易明細")
@@ -0,0 +1,175 @@
+import numpy as np
+
+# --- Numba 加速 (未安裝時退回純 Python，結果相同只是較慢) ---
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs: return args[0]
+        return lambda f: f
+
+@njit(cache=True)
+def rolling_mean(x, w):
+    """單趟滑動視窗平均 (等同 pandas rolling(w).mean())，視窗內有 NaN 則輸出 NaN"""
+    n = x.size
+    out = np.full(n, np.nan)
+    s = 0.0
+    nan_cnt = 0
+    for i in range(n):
+        v = x[i]
+        if np.isnan(v): nan_cnt += 1
+        else: s += v
+        if i >= w:
+            old = x[i - w]
+            if np.isnan(old): nan_cnt -= 1
+            else: s -= old
+        if i >= w - 1 and nan_cnt == 0: out[i] = s / w
+    return out
+
+@njit(cache=True)
+def ma_bollinger(close, w_fast, w_slow, k):
+    """一次掃描同時算出快線 MA、慢線 MA 與布林上下軌 (慢線 ± k 倍標準差，ddof=1)"""
+    n = close.size
+    ma_f = np.full(n, np.nan)
+    ma_s = np.full(n, np.nan)
+    bb_u = np.full(n, np.nan)
+    bb_l = np.full(n, np.nan)
+    s_f = 0.0
+    s_s = 0.0
+    sq_s = 0.0
+    nan_f = 0
+    nan_s = 0
+    for i in range(n):
+        v = close[i]
+        if np.isnan(v):
+            nan_f += 1
+            nan_s += 1
+        else:
+            s_f += v
+            s_s += v
+            sq_s += v * v
+        if i >= w_fast:
+            old = close[i - w_fast]
+            if np.isnan(old): nan_f -= 1
+            else: s_f -= old
+        if i >= w_slow:
+            old = close[i - w_slow]
+            if np.isnan(old): nan_s -= 1
+            else:
+                s_s -= old
+                sq_s -= old * old
+        if i >= w_fast - 1 and nan_f == 0: ma_f[i] = s_f / w_fast
+        if i >= w_slow - 1 and nan_s == 0:
+            m = s_s / w_slow
+            ma_s[i] = m
+            var = (sq_s - s_s * m) / (w_slow - 1)
+            band = k * np.sqrt(var) if var > 0 else 0.0
+            bb_u[i] = m + band
+            bb_l[i] = m - band
+    return ma_f, ma_s, bb_u, bb_l
+
+@njit(cache=True)
+def _ewm_update(value, old_wt, started, x, alpha):
+    # 與 pandas ewm(adjust=False) 相同的遞迴：遇到 NaN 沿用前值，但舊權重照樣衰減
+    if np.isnan(x):
+        if started: old_wt *= 1.0 - alpha
+        return value, old_wt, started
+    if not started: return x, 1.0, True
+    old_wt *= 1.0 - alpha
+    if value != x: value = (old_wt * value + alpha * x) / (old_wt + alpha)
+    return value, 1.0, True
+
+@njit(cache=True)
+def macd(close, fast, slow, signal):
+    """一次掃描同時維護快、慢、訊號三條 EMA，輸出 DIF、DEA 與柱狀體"""
+    n = close.size
+    dif = np.full(n, np.nan)
+    dea = np.full(n, np.nan)
+    hist = np.full(n, np.nan)
+    a_fast = 2.0 / (fast + 1)
+    a_slow = 2.0 / (slow + 1)
+    a_sig = 2.0 / (signal + 1)
+    e_fast = np.nan
+    e_slow = np.nan
+    e_sig = np.nan
+    w_fast = 1.0
+    w_slow = 1.0
+    w_sig = 1.0
+    s_fast = False
+    s_slow = False
+    s_sig = False
+    for i in range(n):
+        e_fast, w_fast, s_fast = _ewm_update(e_fast, w_fast, s_fast, close[i], a_fast)
+        e_slow, w_slow, s_slow = _ewm_update(e_slow, w_slow, s_slow, close[i], a_slow)
+        if s_fast:
+            d = e_fast - e_slow
+            e_sig, w_sig, s_sig = _ewm_update(e_sig, w_sig, s_sig, d, a_sig)
+            dif[i] = d
+            dea[i] = e_sig
+            hist[i] = d - e_sig
+    return dif, dea, hist
+
+@njit(cache=True)
+def obv(close, volume):
+    """單趟累加 OBV：收漲加量、收跌減量，持平、任一收盤或當日成交量為 NaN 時不變"""
+    n = close.size
+    out = np.empty(n)
+    if n == 0: return out
+    acc = 0.0
+    out[0] = 0.0
+    for i in range(1, n):
+        dc = close[i] - close[i - 1]
+        if np.isnan(volume[i]): pass
+        elif dc > 0: acc += volume[i]
+        elif dc < 0: acc -= volume[i]
+        out[i] = acc
+    return out
+
+def partition_quantile(x, q):
+    """與 pandas quantile 相同的線性內插 (略過 NaN)，以 np.partition 取代完整排序"""
+    x = x[~np.isnan(x)]
+    if x.size == 0: return np.nan
+    h = (x.size - 1) * q
+    lo = int(np.floor(h))
+    hi = min(lo + 1, x.size - 1)
+    part = np.partition(x, (lo, hi))
+    return part[lo] + (part[hi] - part[lo]) * (h - lo)
+
+@njit(cache=True)
+def backtest_loop(close, signal, initial_capital):
+    """MA 交叉策略的逐根 K 棒現金/持股狀態機，回傳資產曲線與成交紀錄 (索引、方向、股數)"""
+    n = close.size
+    equity = np.empty(n)
+    trade_idx = np.empty(n, dtype=np.int64)
+    trade_type = np.empty(n, dtype=np.int8)
+    trade_shares = np.empty(n, dtype=np.int64)
+    n_trades = 0
+    cash = float(initial_capital)
+    position = 0
+    for i in range(n):
+        price = close[i]
+        if signal[i] == 1 and position == 0:
+            position = int(cash // price)
+            cash -= position * price
+            trade_idx[n_trades] = i
+            trade_type[n_trades] = 1
+            trade_shares[n_trades] = position
+            n_trades += 1
+        elif signal[i] == -1 and position > 0:
+            cash += position * price
+            trade_idx[n_trades] = i
+            trade_type[n_trades] = -1
+            trade_shares[n_trades] = position
+            n_trades += 1
+            position = 0
+        equity[i] = cash + position * price
+    return equity, trade_idx[:n_trades], trade_type[:n_trades], trade_shares[:n_trades]
+
+def warmup(*kernels):
+    """
+    以 app 實際使用的型別 (float64 價格、int8 訊號) 各呼叫一次指定的 kernel
+    cache=True 且已有快取檔時只是從磁碟載入機器碼，否則會在這裡編譯；由呼叫端決定在什麼時機執行
+    """
+    x = np.linspace(1.0, 2.0, 64)
+    args = {rolling_mean: (x, 5), ma_bollinger: (x, 5, 20, 2.0), macd: (x, 12, 26, 9), obv: (x, x), backtest_loop: (x, np.zeros(64, dtype=np.int8), 100000.0)}
+    for k in kernels: k(*args[k])
@@ -3,7 +3,9 @@ import yfinance as yf
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
+from indicators import rolling_mean
 
 # --- 頁面設定 ---
 st.set_page_config(page_title="專業股票分析儀表板", layout="wide")
@@ -25,14 +27,14 @@ show_ma20 = st.sidebar.checkbox("顯示 MA20 (月線)", value=True)
 show_ma60 = st.sidebar.checkbox("顯示 MA60 (季線)", value=False)
 
 # --- 數據獲取 ---
-@st.cache_data
+# 只抓 K 線 (原本附帶的 info 沒有用到，省下一次請求)；與 app.py 一樣 5 分鐘後重抓
+@st.cache_data(ttl=300)
 def load_data(ticker, period):
-    data = yf.Ticker(ticker)
-    df = data.history(period=period)
-    return df, data.info
+    return yf.Ticker(ticker).history(period=period)
 
 try:
-    df, stock_info = load_data(ticker_input, time_period)
+    df = load_data(ticker_input, time_period)
+    close = df['Close'].to_numpy(dtype=np.float64)
     
     # 顯示基本資訊
     col1, col2, col3 = st.columns(3)
@@ -58,19 +60,19 @@ try:
 
     # 移動平均線
     if show_ma5:
-        df['MA5'] = df['Close'].rolling(window=5).mean()
+        df['MA5'] = rolling_mean(close, 5)
         fig.add_trace(go.Scatter(x=df.index, y=df['MA5'], opacity=0.7, line=dict(color='blue', width=1), name='MA 5'), row=1, col=1)
     
     if show_ma20:
-        df['MA20'] = df['Close'].rolling(window=20).mean()
+        df['MA20'] = rolling_mean(close, 20)
         fig.add_trace(go.Scatter(x=df.index, y=df['MA20'], opacity=0.7, line=dict(color='orange', width=1), name='MA 20'), row=1, col=1)
 
     if show_ma60:
-        df['MA60'] = df['Close'].rolling(window=60).mean()
+        df['MA60'] = rolling_mean(close, 60)
         fig.add_trace(go.Scatter(x=df.index, y=df['MA60'], opacity=0.7, line=dict(color='green', width=1), name='MA 60'), row=1, col=1)
 
     # 成交量圖
-    colors = ['green' if row['Open'] - row['Close'] >= 0 else 'red' for index, row in df.iterrows()]
+    colors = np.where(df['Open'].to_numpy() >= df['Close'].to_numpy(), 'green', 'red')
     fig.add_trace(go.Bar(x=df.index, y=df['Volume'], marker_color=colors, name='成交量'), row=2, col=1)
 
     # 圖表美化